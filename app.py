@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """
 重庆市潼南区塘坝文昌学校成绩计算工具 - Web版
-功能：Excel上传、年级/班级成绩统计、Excel报告导出
+功能：Excel上传、年级/班级成绩统计、分数分布直方图、Excel报告导出
 统计规则：
 1.  平均分取各班/年级前95%最高成绩
 2.  优生 ≥ 80% 单科总分
@@ -13,8 +13,11 @@ GitHub托管专用，无本地文件依赖，可直接克隆运行
 # 导入必要依赖（均为PyPI公开库，GitHub克隆后可通过requirements.txt安装）
 from flask import Flask, request, jsonify, send_file
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from openpyxl.styles import Alignment
+from openpyxl.chart import BarChart, Reference
+from openpyxl.utils import get_column_letter
 import io
 
 # 1. 初始化Flask应用（符合Web服务规范，无硬编码）
@@ -35,6 +38,8 @@ class ScoreAnalyzer:
         self.df = None  # 存储Excel解析数据
         self.excel_buffer = io.BytesIO()  # 内存缓冲区存储Excel报告，无本地文件生成
         self.analysis_result = ""  # 存储文本格式分析结果
+        self.histogram_bins = 10  # 分数分布直方图分段数（按单科总分等宽划分）
+        self.histogram_data = {}  # 存储各班×各科分数分布数据（可直接转JSON）
 
     def load_excel_file(self, file_stream):
         """
@@ -65,6 +70,32 @@ class ScoreAnalyzer:
         except Exception as e:
             return False, f"文件加载失败：{str(e)}"
 
+    def _prepare_scores(self):
+        """
+        分数预处理：转数值类型、空值填充为0，并计算总分
+        :return: 预处理后的成绩数据副本
+        """
+        df = self.df.copy()
+        for col in self.scores_columns.values():
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        df['总分'] = df[list(self.scores_columns.values())].sum(axis=1, skipna=True)
+        return df
+
+    def compute_histograms(self, full_scores):
+        """
+        仅计算分数分布（不生成文本结果与Excel报告，供JSON接口使用）
+        :param full_scores: 各科总分配置字典
+        :return: (是否成功, 提示信息)
+        """
+        if self.df is None:
+            return False, "请先加载有效的Excel成绩文件！"
+        
+        try:
+            self.histogram_data = self._compute_histograms(self._prepare_scores(), full_scores)
+            return True, "分数分布计算完成"
+        except Exception as e:
+            return False, f"分数分布计算失败：{str(e)}"
+
     def analyze_scores(self, full_scores):
         """
         核心成绩统计（修正差生判定规则：<40%总分）
@@ -75,15 +106,14 @@ class ScoreAnalyzer:
             return False, "请先加载有效的Excel成绩文件！"
         
         try:
-            df = self.df.copy()
+            # 分数预处理：转数值类型、空值填充为0
+            df = self._prepare_scores()
             total_students = len(df)
             results_text = []
             excel_data = []
 
-            # 分数预处理：转数值类型、空值填充为0
-            for col in self.scores_columns.values():
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            df['总分'] = df[list(self.scores_columns.values())].sum(axis=1, skipna=True)
+            # ---------------------- 分数分布直方图（一次性向量化分段） ----------------------
+            self.histogram_data = self._compute_histograms(df, full_scores)
 
             # ---------------------- 年级整体统计 ----------------------
             results_text.append("=" * 80)
@@ -191,6 +221,97 @@ class ScoreAnalyzer:
         except Exception as e:
             return False, f"成绩分析失败：{str(e)}"
 
+    def _compute_histograms(self, df, full_scores):
+        """
+        计算年级及各班×各科的分数分布（等宽分段，段宽=单科总分/分段数）
+        所有班级、科目在同一次np.bincount中完成计数，无逐班逐科循环
+        :param df: 已完成数值预处理的成绩数据
+        :param full_scores: 各科总分配置字典
+        :return: 分布数据字典（分段标签、年级及各班各科人数）
+        """
+        bins = self.histogram_bins
+        subjects = list(self.scores_columns.keys())
+        subject_count = len(subjects)
+        full = np.array([float(full_scores[subj]) for subj in subjects])
+
+        # 分段序号：超出总分（附加分）计入最高段，负分计入最低段
+        # 先乘后除，避免 scores / full 的浮点误差把恰在分段边界上的分数（如12分制的2.4分）计入下一段
+        scores = df[list(self.scores_columns.values())].to_numpy(dtype=float)
+        bin_idx = np.clip(np.floor(scores * bins / full), 0, bins - 1).astype(np.int64)
+
+        # 班级编码：与统计表保持相同的排序；班级为空的学生单独编码，仅计入年级
+        classes = sorted(df['B'].dropna().unique())
+        class_codes = pd.Categorical(df['B'], categories=classes).codes.astype(np.int64)
+        class_codes[class_codes < 0] = len(classes)
+
+        # 组合键 (班级, 科目, 分段) 一次计数
+        keys = (class_codes[:, None] * subject_count + np.arange(subject_count)) * bins + bin_idx
+        counts = np.bincount(
+            keys.ravel(), minlength=(len(classes) + 1) * subject_count * bins
+        ).reshape(len(classes) + 1, subject_count, bins)
+
+        labels = []
+        for subject in subjects:
+            width = full_scores[subject] / bins
+            labels.append([f"{width * i:g}-{width * (i + 1):g}" for i in range(bins)])
+
+        grade_counts = counts.sum(axis=0)
+        return {
+            'bins': bins,
+            'subjects': subjects,
+            'labels': dict(zip(subjects, labels)),
+            'grade': {subj: grade_counts[i].tolist() for i, subj in enumerate(subjects)},
+            'classes': {
+                f'{class_name}': {subj: counts[c, i].tolist() for i, subj in enumerate(subjects)}
+                for c, class_name in enumerate(classes)
+            }
+        }
+
+    def _write_histogram_sheet(self, writer):
+        """
+        写入「分数分布」工作表：每科一个分布表（DataFrame整块写入）+ 一个原生柱状图
+        :param writer: 已打开的pd.ExcelWriter
+        """
+        hist = self.histogram_data
+        if not hist:
+            return
+
+        sheet_name = '分数分布'
+        class_names = list(hist['classes'].keys())
+        bins = hist['bins']
+        block_height = max(bins + 3, 18)  # 保证图表（默认约15行高）不与下一科重叠
+        table_width = 2 + len(class_names)
+
+        for block, subject in enumerate(hist['subjects']):
+            start_row = block * block_height
+            table = {'年级整体': hist['grade'][subject]}
+            for class_name in class_names:
+                table[class_name] = hist['classes'][class_name][subject]
+            df_hist = pd.DataFrame(table, index=pd.Index(hist['labels'][subject], name=f'{subject}分数段'))
+            df_hist.to_excel(writer, sheet_name=sheet_name, startrow=start_row)
+            worksheet = writer.sheets[sheet_name]
+
+            # 柱状图对比各班分布（无班级数据时展示年级整体）
+            header_row = start_row + 1
+            chart = BarChart()
+            chart.type = 'col'
+            chart.title = f'{subject}成绩分布'
+            chart.x_axis.title = '分数段'
+            chart.y_axis.title = '人数'
+            data = Reference(
+                worksheet,
+                min_col=3 if class_names else 2,
+                max_col=table_width,
+                min_row=header_row,
+                max_row=header_row + bins
+            )
+            categories = Reference(worksheet, min_col=1, min_row=header_row + 1, max_row=header_row + bins)
+            chart.add_data(data, titles_from_data=True)
+            chart.set_categories(categories)
+            worksheet.add_chart(chart, f'{get_column_letter(table_width + 2)}{header_row}')
+
+        worksheet.column_dimensions['A'].width = 15
+
     def _generate_excel_report(self, excel_data, full_scores):
         """
         生成Excel分析报告（内存缓冲区，适配GitHub无本地写入权限环境）
@@ -253,6 +374,9 @@ class ScoreAnalyzer:
             ws_config = writer.sheets['分析配置']
             ws_config.column_dimensions['A'].width = 15
             ws_config.column_dimensions['B'].width = 30
+
+            # 工作表3：分数分布（各班各科分布表 + 柱状图）
+            self._write_histogram_sheet(writer)
         
         # 重置缓冲区指针（关键：确保下载时能读取到完整内容）
         self.excel_buffer.seek(0)
@@ -275,47 +399,63 @@ def health_check():
                 "science": "可选，科学总分（默认100）",
                 "politics": "可选，道法总分（默认100）"
             },
-            "return": "Excel格式成绩分析报告"
+            "return": "Excel格式成绩分析报告",
+            "histogram": "POST /histogram，参数同上，返回JSON格式的各班各科分数分布"
         }
     }), 200
 
+def _run_analysis(build_report=True):
+    """
+    解析上传文件与总分配置并执行分析（/analyze 与 /histogram 共用）
+    :param build_report: 是否生成完整统计与Excel报告；为False时仅计算分数分布
+    :return: (分析器, 错误响应)，成功时错误响应为None
+    """
+    # 1. 校验上传文件
+    if 'file' not in request.files:
+        return None, (jsonify({"code": 400, "msg": "未上传任何Excel文件"}), 400)
+    
+    file = request.files['file']
+    if file.filename == '' or not file.filename.lower().endswith('.xlsx'):
+        return None, (jsonify({"code": 400, "msg": "请上传有效的.xlsx格式Excel文件"}), 400)
+    
+    # 2. 接收各科总分配置（默认100分，支持自定义）
+    full_scores = {
+        '语文': float(request.form.get('chinese', 100)),
+        '数学': float(request.form.get('math', 100)),
+        '英语': float(request.form.get('english', 100)),
+        '科学': float(request.form.get('science', 100)),
+        '道法': float(request.form.get('politics', 100))
+    }
+    
+    # 3. 校验总分配置有效性
+    for subj, score in full_scores.items():
+        if score <= 0:
+            return None, (jsonify({"code": 400, "msg": f"{subj}总分必须大于0"}), 400)
+    
+    # 4. 执行成绩分析
+    analyzer = ScoreAnalyzer()
+    load_success, load_msg = analyzer.load_excel_file(file.stream)
+    if not load_success:
+        return None, (jsonify({"code": 500, "msg": load_msg}), 500)
+    
+    if build_report:
+        analyze_success, analyze_msg = analyzer.analyze_scores(full_scores)
+    else:
+        analyze_success, analyze_msg = analyzer.compute_histograms(full_scores)
+    if not analyze_success:
+        return None, (jsonify({"code": 500, "msg": analyze_msg}), 500)
+    
+    return analyzer, None
+
 @app.route('/analyze', methods=['POST'])
 def analyze_api():
     """核心分析接口：接收Excel上传，返回分析报告"""
     try:
-        # 1. 校验上传文件
-        if 'file' not in request.files:
-            return jsonify({"code": 400, "msg": "未上传任何Excel文件"}), 400
+        analyzer, error_response = _run_analysis()
+        if error_response is not None:
+            return error_response
         
-        file = request.files['file']
-        if file.filename == '' or not file.filename.lower().endswith('.xlsx'):
-            return jsonify({"code": 400, "msg": "请上传有效的.xlsx格式Excel文件"}), 400
-        
-        # 2. 接收各科总分配置（默认100分，支持自定义）
-        full_scores = {
-            '语文': float(request.form.get('chinese', 100)),
-            '数学': float(request.form.get('math', 100)),
-            '英语': float(request.form.get('english', 100)),
-            '科学': float(request.form.get('science', 100)),
-            '道法': float(request.form.get('politics', 100))
-        }
-        
-        # 3. 校验总分配置有效性
-        for subj, score in full_scores.items():
-            if score <= 0:
-                return jsonify({"code": 400, "msg": f"{subj}总分必须大于0"}), 400
-        
-        # 4. 执行成绩分析
-        analyzer = ScoreAnalyzer()
-        load_success, load_msg = analyzer.load_excel_file(file.stream)
-        if not load_success:
-            return jsonify({"code": 500, "msg": load_msg}), 500
-        
-        analyze_success, analyze_msg = analyzer.analyze_scores(full_scores)
-        if not analyze_success:
-            return jsonify({"code": 500, "msg": analyze_msg}), 500
-        
-        # 5. 返回Excel文件下载（带时间戳，避免文件名重复）
+        # 返回Excel文件下载（带时间戳，避免文件名重复）
         return send_file(
             analyzer.excel_buffer,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -325,6 +465,18 @@ def analyze_api():
     except Exception as e:
         return jsonify({"code": 500, "msg": f"服务器内部错误：{str(e)}"}), 500
 
+@app.route('/histogram', methods=['POST'])
+def histogram_api():
+    """分数分布接口：接收Excel上传，返回JSON格式的年级及各班各科分数分布"""
+    try:
+        analyzer, error_response = _run_analysis(build_report=False)
+        if error_response is not None:
+            return error_response
+        
+        return jsonify({"code": 200, "msg": "分数分布计算完成", "data": analyzer.histogram_data}), 200
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"服务器内部错误：{str(e)}"}), 500
+
 # 4. 启动服务（适配本地调试与GitHub托管环境）
 if __name__ == "__main__":
     app.run(debug=False, host='0.0.0.0', port=5000)